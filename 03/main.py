@@ -1,19 +1,88 @@
 """AOC 2024 - Day 3: 'Mull It Over'.
 
 We will do this using a regex.
+
+For very large inputs there is also a chunked scanner that memory-maps the file
+and scans the chunks in parallel. Each chunk is reduced to a small summary which
+can be combined with its neighbours, so both parts come out of a single pass.
+
+The chunks are scanned by hand using 'bytes.find' to jump between the 'mul(',
+'do()' and "don't()" anchors, which is a little quicker than the regex engine
+and gets both parts at once.
+
+Run with '--bench' to compare the scanners on a large generated input.
 """
 
 from __future__ import annotations
 
+import mmap
+import os
+import random
 import re
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
 from pathlib import Path
-from typing import Generator
+from typing import TYPE_CHECKING, Generator, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
 # This regex will find each proper 'mul(x,y)' string and return a list of each
 # pair as a tuple. It will also match the `do()` and `don't()` for the second
 # part
 REGEX = r"mul\((\d{1,3}),(\d{1,3})\)|do\(\)|don't\(\)"
 
+# the same regex for scanning raw bytes (ie a memory-mapped file)
+BYTES_REGEX = re.compile(REGEX.encode())
+
+# the longest thing the regex can match. A chunk is scanned this far past its
+# end (less one) so matches straddling the boundary are not lost.
+MAX_MATCH_LENGTH = len("mul(999,999)")
+
+# default chunk size for the parallel scanner, 8MB
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# the most digits allowed in each 'mul' argument
+MAX_DIGITS = 3
+
+
+class ScanResult(NamedTuple):
+    """Summary of one chunk of the input.
+
+    The part 2 total of a chunk depends on whether 'mul' is enabled when we
+    enter it, so we keep the total for both cases along with the state left by
+    the last toggle. Combining two results is associative, so the chunks can be
+    scanned in any order and merged afterwards.
+    """
+
+    total: int  # every 'mul', ignoring the toggles (part 1)
+    if_enabled: int  # part 2 total if the chunk starts enabled
+    if_disabled: int  # part 2 total if the chunk starts disabled
+    last_toggle: bool | None  # state set by the final toggle, None if none
+
+    def combine(self, other: ScanResult) -> ScanResult:
+        """Return the result of this chunk followed by the 'other' chunk."""
+        after_enabled = True if self.last_toggle is None else self.last_toggle
+        after_disabled = False if self.last_toggle is None else self.last_toggle
+        return ScanResult(
+            self.total + other.total,
+            self.if_enabled
+            + (other.if_enabled if after_enabled else other.if_disabled),
+            self.if_disabled
+            + (other.if_enabled if after_disabled else other.if_disabled),
+            (
+                self.last_toggle
+                if other.last_toggle is None
+                else other.last_toggle
+            ),
+        )
+
+
+EMPTY_RESULT = ScanResult(0, 0, 0, None)
+
 
 # get the data in from file
 def get_data() -> str:
@@ -52,9 +121,230 @@ def calculate(data: str, *, use_toggle: bool = False) -> int:
     return sum(x * y for x, y in get_pairs(data, use_toggle=use_toggle))
 
 
-data = get_data()
-part1_result = calculate(data)
-part2_result = calculate(data, use_toggle=True)
+def scan_chunk(buffer: bytes | mmap.mmap, start: int, end: int) -> ScanResult:
+    """Scan the matches that start between 'start' and 'end'.
+
+    Matches can never overlap each other, so a match belongs to the chunk it
+    starts in. We look a little past 'end' to pick up one that straddles the
+    boundary, the next chunk will skip it as it starts before that chunk does.
+    """
+    total = if_enabled = if_disabled = 0
+    toggle: bool | None = None
+
+    stop = min(end + MAX_MATCH_LENGTH - 1, len(buffer))
+    for match in BYTES_REGEX.finditer(buffer, start, stop):
+        if match.start() >= end:
+            break
+        if match.group(0) == b"do()":
+            toggle = True
+        elif match.group(0) == b"don't()":
+            toggle = False
+        else:
+            value = int(match.group(1)) * int(match.group(2))
+            total += value
+            if toggle is None:
+                if_enabled += value
+            elif toggle:
+                if_enabled += value
+                if_disabled += value
+
+    return ScanResult(total, if_enabled, if_disabled, toggle)
+
+
+def scan_bytes(
+    buffer: bytes | mmap.mmap, start: int = 0, end: int | None = None
+) -> ScanResult:
+    """Scan the matches that start between 'start' and 'end' without a regex.
+
+    Works the same as 'scan_chunk', but jumps straight to each 'mul(' with
+    'bytes.find' and checks the few bytes after it by hand. The toggles are
+    found the same way and applied in order as we pass them, so it is still a
+    single pass over the data.
+    """
+    if end is None:
+        end = len(buffer)
+    total = if_enabled = if_disabled = 0
+    toggle: bool | None = None
+
+    # no anchor can start here, so it stands in for 'not found'
+    never = len(buffer)
+
+    def find_toggle(anchor: bytes, pos: int) -> int:
+        found = buffer.find(anchor, pos, end + len(anchor) - 1)
+        return never if found == -1 else found
+
+    # each search only finds anchors that start before 'end'
+    find = buffer.find
+    mul_end = end + 3
+    next_mul = find(b"mul(", start, mul_end)
+    next_do = find_toggle(b"do()", start)
+    next_dont = find_toggle(b"don't()", start)
+    next_toggle = min(next_do, next_dont)
+
+    while True:
+        # apply any toggles we have passed, in order
+        limit = never if next_mul == -1 else next_mul
+        while next_toggle < limit:
+            if next_do < next_dont:
+                toggle = True
+                next_do = find_toggle(b"do()", next_do + 4)
+            else:
+                toggle = False
+                next_dont = find_toggle(b"don't()", next_dont + 7)
+            next_toggle = min(next_do, next_dont)
+
+        if next_mul == -1:
+            break
+
+        # the longest valid arguments are '999,999)', so only look that far
+        args_start = next_mul + 4
+        args = buffer[args_start : args_start + MAX_MATCH_LENGTH - 4]
+        close = args.find(b")")
+        if close > 0:
+            x, comma, y = args[:close].partition(b",")
+            if (
+                comma
+                and len(x) <= MAX_DIGITS
+                and len(y) <= MAX_DIGITS
+                and x.isdigit()
+                and y.isdigit()
+            ):
+                value = int(x) * int(y)
+                total += value
+                if toggle is None:
+                    if_enabled += value
+                elif toggle:
+                    if_enabled += value
+                    if_disabled += value
+
+        next_mul = find(b"mul(", args_start, mul_end)
+
+    return ScanResult(total, if_enabled, if_disabled, toggle)
+
+
+def scan_file_chunk(filename: str, start: int, end: int) -> ScanResult:
+    """Memory-map the file and scan a single chunk of it.
+
+    This runs in a worker process, the OS page cache shares the file data.
+    """
+    with (
+        Path(filename).open("rb") as file,
+        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer,
+    ):
+        return scan_bytes(buffer, start, end)
+
+
+def scan_file(
+    filename: str,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int | None = None,
+) -> tuple[int, int]:
+    """Return the totals for both parts, scanning the file in parallel chunks.
+
+    Small files (a single chunk) are scanned in this process instead.
+    """
+    size = Path(filename).stat().st_size
+    if size == 0:
+        return 0, 0
+
+    starts = list(range(0, size, chunk_size))
+    ends = [min(start + chunk_size, size) for start in starts]
+
+    if len(starts) == 1:
+        result = scan_file_chunk(filename, 0, size)
+    else:
+        workers = min(workers or os.cpu_count() or 1, len(starts))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(
+                scan_file_chunk, [filename] * len(starts), starts, ends
+            )
+            # map() keeps the chunk order, which the toggle state relies on.
+            result = reduce(ScanResult.combine, results, EMPTY_RESULT)
+
+    return result.total, result.if_enabled
+
+
+def generate_data(size: int, seed: int = 2024) -> bytes:
+    """Generate roughly 'size' bytes of corrupted memory for benchmarking.
+
+    A 1MB block of random fragments is repeated to make up the size, which is
+    much quicker than generating it all and makes no difference to the scan.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    fragments = [
+        b"mul(",
+        b"mul(1,2)",
+        b"mul(12,345)",
+        b"mul(999,999)",
+        b"mul(1234,5)",
+        b"mul[3,7]",
+        b"do()",
+        b"don't()",
+        b"do(",
+        b"12",
+        b",",
+        b")",
+        b"!@^&*",
+        b"what()",
+        b"from()",
+    ]
+    noise = b"!@#$%^&*()[]{}<>?,' +-:;/"
+    block = bytearray()
+    while len(block) < 1024 * 1024:
+        block += bytes(rng.choices(noise, k=rng.randint(0, 20)))
+        block += rng.choice(fragments)
+    return (bytes(block) * (size // len(block) + 1))[:size]
+
+
+def benchmark(size_mb: int = 100) -> None:
+    """Compare each scanner on a large generated input."""
+    data = generate_data(size_mb * 1024 * 1024)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = str(Path(tmp) / "input.txt")
+        Path(filename).write_bytes(data)
+        text = data.decode()
+
+        def regex_finditer() -> tuple[int, int]:
+            return calculate(text), calculate(text, use_toggle=True)
+
+        def regex_scan_chunk() -> tuple[int, int]:
+            result = scan_chunk(data, 0, len(data))
+            return result.total, result.if_enabled
+
+        def hand_rolled() -> tuple[int, int]:
+            result = scan_bytes(data)
+            return result.total, result.if_enabled
+
+        scanners: dict[str, Callable[[], tuple[int, int]]] = {
+            "regex finditer (x2)": regex_finditer,
+            "regex scan_chunk": regex_scan_chunk,
+            "scan_bytes": hand_rolled,
+            "scan_file (parallel)": lambda: scan_file(filename),
+        }
+
+        print(f"Scanning {len(data) / 1024 / 1024:.0f}MB of corrupted memory")
+        for name, scanner in scanners.items():
+            start_time = time.perf_counter()
+            part1_result, part2_result = scanner()
+            elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+            print(
+                f"{name:>20} : {elapsed_time_ms:10.3f} ms "
+                f"({part1_result}, {part2_result})"
+            )
+
+
+def main() -> None:
+    """Run the AOC problems for Day 3."""
+    part1_result, part2_result = scan_file("input.txt")
+
+    print(f"Result for part1 is {part1_result}")  # for me is 159833790
+    print(f"Result for part2 is {part2_result}")  # for me is 89349241
+
 
-print(f"Result for part1 is {part1_result}")  # for me is 159833790
-print(f"Result for part2 is {part2_result}")  # for me is 89349241
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
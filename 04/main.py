@@ -1,6 +1,38 @@
-"""AOC 2024 - Day 4: Ceres Search."""
+"""AOC 2024 - Day 4: Ceres Search.
 
+The original solutions probe the grid one character at a time. For large grids
+there are faster versions too:
+
+- Part 1 builds the rows, columns and both diagonals of the grid once as a
+  string, then lets 'str.count' do the searching at C speed.
+- Searching for many words at once streams the same projections through an
+  Aho-Corasick automaton, so the grid is only read once however many words
+  there are.
+- Part 2 loads the grid into a NumPy array and finds every X-MAS at once by
+  comparing shifted views of it.
+
+Run with '--bench' to compare them on a large generated grid.
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+import time
+from collections import deque
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# separates the lines in the projections, so no match can span two of them
+SEPARATOR = "\n"
+
+# an X-MAS is a 3x3 square, so smaller grids can't hold one
+XMAS_SIZE = 3
 
 
 # ----------------------------- support functions ---------------------------- #
@@ -77,12 +109,220 @@ def part2(grid: list[str]) -> int:
     return count
 
 
+# ------------------------- faster large-grid versions ----------------------- #
+def get_cells(grid: list[str]) -> np.ndarray:
+    """Return the grid as a 2D NumPy array of character codes."""
+    return np.frombuffer("".join(grid).encode(), dtype=np.uint8).reshape(
+        len(grid), len(grid[0])
+    )
+
+
+def get_projections(grid: list[str]) -> str:
+    """Return every row, column and diagonal of the grid in a single string.
+
+    Each line is separated so a word can't be matched across the end of one
+    line into the start of the next. Searching this for a word and its reverse
+    covers all 8 directions. NumPy does the slicing for us, but the result is a
+    plain string.
+    """
+    cells = get_cells(grid)
+    flipped = np.fliplr(cells)
+    rows, cols = cells.shape
+    offsets = range(1 - rows, cols)
+
+    lines = [
+        *(line.tobytes() for line in cells),
+        *(column.tobytes() for column in cells.T),
+        *(cells.diagonal(offset).tobytes() for offset in offsets),
+        *(flipped.diagonal(offset).tobytes() for offset in offsets),
+    ]
+    return SEPARATOR.encode().join(lines).decode()
+
+
+def count_word(projections: str, word: str) -> int:
+    """Count a word in the projections, reading both forwards and backwards.
+
+    'str.count' does not count overlapping matches, but a word like 'XMAS' can
+    never overlap itself so that is fine here. Use 'count_words' for anything
+    else.
+    """
+    return projections.count(word) + projections.count(word[::-1])
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton to find many words in a single pass of a text.
+
+    The trie of all the words is turned into a full state machine, so each
+    character of the text is a single dictionary lookup. Rather than following
+    the output links at every match, we just count how often each state is
+    reached, then push those counts down the failure links once at the end.
+    """
+
+    def __init__(self, words: list[str]) -> None:
+        """Build the automaton for the given words."""
+        self.transitions: list[dict[str, int]] = [{}]
+        self.word_states: list[int] = []
+
+        # build the trie, remembering the state each word ends on
+        for word in words:
+            state = 0
+            for char in word:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(self.transitions)
+                    self.transitions[state][char] = next_state
+                    self.transitions.append({})
+                state = next_state
+            self.word_states.append(state)
+
+        # add the failure links breadth first, filling in the missing
+        # transitions as we go so the text never has to follow them itself.
+        self.fail = [0] * len(self.transitions)
+        self.order: list[int] = []  # states in breadth first order
+        alphabet = {char for word in words for char in word}
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            self.order.append(state)
+            fail_transitions = self.transitions[self.fail[state]]
+            for char in alphabet:
+                next_state = self.transitions[state].get(char)
+                if next_state is None:
+                    if char in fail_transitions:
+                        self.transitions[state][char] = fail_transitions[char]
+                else:
+                    self.fail[next_state] = fail_transitions.get(char, 0)
+                    queue.append(next_state)
+
+    def count(self, text: str) -> list[int]:
+        """Return how often each word is in the text, overlaps included."""
+        transitions = self.transitions
+        hits = [0] * len(transitions)
+
+        state = 0
+        for char in text:
+            state = transitions[state].get(char, 0)
+            hits[state] += 1
+
+        # reaching a state also matches every word ending on its failure chain
+        for state in reversed(self.order):
+            hits[self.fail[state]] += hits[state]
+
+        return [hits[state] for state in self.word_states]
+
+
+def count_words(grid: list[str], words: list[str]) -> dict[str, int]:
+    """Count how many times each word appears in the grid, in all 8 directions.
+
+    The reversed words are added to the automaton too, so the projections only
+    have to be read once, in one direction.
+    """
+    unique_words = list(dict.fromkeys(words))
+    automaton = AhoCorasick(
+        unique_words + [word[::-1] for word in unique_words]
+    )
+    counts = automaton.count(get_projections(grid))
+
+    forwards, backwards = (
+        counts[: len(unique_words)],
+        counts[len(unique_words) :],
+    )
+    return {
+        word: forward + backward
+        for word, forward, backward in zip(
+            unique_words, forwards, backwards, strict=True
+        )
+    }
+
+
+def part1_projections(grid: list[str]) -> int:
+    """Part one, but counting 'XMAS' in the line projections of the grid."""
+    return count_word(get_projections(grid), "XMAS")
+
+
+def part2_numpy(grid: list[str]) -> int:
+    """Part two, checking every possible X-MAS at once with NumPy.
+
+    The four corner views are the grid shifted one place diagonally, so each
+    element lines up with the 'A' in the middle of the centre view.
+    """
+    rows, cols = len(grid), len(grid[0])
+    if rows < XMAS_SIZE or cols < XMAS_SIZE:
+        return 0
+
+    cells = get_cells(grid)
+    m, a, s = ord("M"), ord("A"), ord("S")
+
+    centre = cells[1:-1, 1:-1] == a
+    top_left, top_right = cells[:-2, :-2], cells[:-2, 2:]
+    bottom_left, bottom_right = cells[2:, :-2], cells[2:, 2:]
+
+    first_mas = ((top_left == m) & (bottom_right == s)) | (
+        (top_left == s) & (bottom_right == m)
+    )
+    second_mas = ((top_right == m) & (bottom_left == s)) | (
+        (top_right == s) & (bottom_left == m)
+    )
+
+    return int(np.count_nonzero(centre & first_mas & second_mas))
+
+
+def generate_grid(size: int, seed: int = 2024) -> list[str]:
+    """Generate a random square grid of the letters 'XMAS' for benchmarking."""
+    rng = random.Random(seed)  # noqa: S311
+    return ["".join(rng.choices("XMAS", k=size)) for _ in range(size)]
+
+
+def benchmark(size: int = 5000, word_count: int = 1000) -> None:
+    """Compare the solutions for each part on a large generated grid.
+
+    The multi-word search looks for 'XMAS' along with a list of random words.
+    """
+    grid = generate_grid(size)
+    rng = random.Random(size)  # noqa: S311
+    words = ["XMAS"] + [
+        "".join(rng.choices("XMAS", k=rng.randint(3, 10)))
+        for _ in range(word_count - 1)
+    ]
+
+    solutions: dict[str, Callable[[list[str]], int]] = {
+        "part1": part1,
+        "part1_projections": part1_projections,
+        "count_words": lambda grid: count_words(grid, words)["XMAS"],
+        "part2": part2,
+        "part2_numpy": part2_numpy,
+    }
+
+    print(
+        f"Searching a {size}x{size} grid ({word_count} words for count_words)"
+    )
+    for name, solution in solutions.items():
+        start_time = time.perf_counter()
+        result = solution(grid)
+        elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+        print(f"{name:>17} : {elapsed_time_ms:10.3f} ms ({result})")
+
+
 # -------------------------------- do the work ------------------------------- #
-data = read_data()
+def main() -> None:
+    """Run the AOC problems for Day 4."""
+    data = read_data()
+
+    # O(n^2) for square grid - answer for me is 2458
+    print(
+        "Answer for Part 1 (number of 'XMAS' in the grid) is "
+        f"{part1_projections(data)}"
+    )
 
+    # O(n^2) for square grid - answer for me is 1737
+    print(
+        "Answer for Part 2 (number of 'X-MAS' in the grid) is "
+        f"{part2_numpy(data)}"
+    )
 
-# O(n^2) for square grid - answer for me is 2458
-print(f"Answer for Part 1 (number of 'XMAS' in the grid) is {part1(data)}")
 
-# O(n^2) for square grid - answer for me is 1737
-print(f"Answer for Part 2 (number of 'X-MAS' in the grid) is {part2(data)}")
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
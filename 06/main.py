@@ -1,10 +1,49 @@
-"""AOC 2024 - Day 6: Guard Gallivant."""
+"""AOC 2024 - Day 6: Guard Gallivant.
+
+The original solutions move the guard one cell at a time. The faster versions
+precompute a jump table holding, for every cell and direction, the cell where
+the guard would stop in front of the next obstacle. The guard then jumps
+straight from one turn to the next. For part 2 the candidate obstacle is
+patched into the table on the fly, since it only changes the jumps along its
+own row and column.
+
+Rather than starting every part 2 check from the beginning, we remember where
+the guard was just before first stepping onto each cell of the path, and carry
+on from there with the obstacle in that cell.
+
+The turns already taken are tracked in a bytearray of direction flags per
+cell, each stamped with the check it belongs to, so nothing has to be cleared
+or allocated between checks.
+
+Each of those checks is independent, so they can also be shared out across a
+pool of worker processes, each building its own copy of the jump table once.
+
+Run with '--bench' to compare them on a large generated map.
+"""
 
 from __future__ import annotations
 
+import os
+import random
 import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+# the guard leaves the map rather than stopping at an obstacle
+EXIT = -1
+
+# the highest check number the turn stamps can hold before starting again
+MAX_GENERATION = 2**32 - 1
+
+# each worker process builds its own jump table once, in 'init_worker'
+worker_table: JumpTable | None = None
 
 
 def get_start_position(data: list[str]) -> tuple[int, int] | None:
@@ -157,6 +196,347 @@ def part2(
     return valid_positions
 
 
+class JumpTable:
+    """Where the guard stops when walking from any cell in any direction.
+
+    Cells are numbered row by row (y * width + x) and directions are
+    [up, right, down, left] as in the originals. 'stops[direction][cell]' is
+    the last cell before an obstacle, or EXIT if the guard walks off the map.
+    """
+
+    def __init__(self, dimensions: tuple[int, int], grid: list[str]) -> None:
+        """Build the table with one sweep along each row and column."""
+        self.width, self.height = width, height = dimensions
+        self.steps = (-width, 1, width, -1)
+        self.stops = up, right, down, left = tuple(
+            [EXIT] * (width * height) for _ in range(4)
+        )
+        self.jump_count = 0  # jumps taken by 'is_loop', to measure the work
+
+        # a bit per direction for the turns made in each cell, only counting
+        # if the cell's stamp matches the current generation (check number).
+        self.turn_flags = bytearray(width * height)
+        self.turn_generations = array("I", bytes(4 * width * height))
+        self.generation = 0
+
+        rows = [line[:width] for line in grid[:height]]
+        for y, line in enumerate(rows):
+            self.fill_line(line, y * width, 1, left, right)
+        for x, column in enumerate(zip(*rows, strict=True)):
+            self.fill_line("".join(column), x, width, up, down)
+
+    @staticmethod
+    def fill_line(
+        line: str,
+        first: int,
+        stride: int,
+        backward: list[int],
+        forward: list[int],
+    ) -> None:
+        """Fill in the stops for a single row or column.
+
+        Every cell between two obstacles has the same stops, so each gap is
+        filled in with one slice assignment. The obstacle cells get filled in
+        too, but the guard can never stand on one so that doesn't matter.
+        """
+        gap_start = 0
+        while True:
+            obstacle = line.find("#", gap_start)
+            gap_end = len(line) if obstacle == -1 else obstacle
+            gap_first = first + gap_start * stride
+            gap = slice(gap_first, first + gap_end * stride, stride)
+            size = gap_end - gap_start
+
+            if gap_start > 0:
+                backward[gap] = [gap_first] * size
+            if obstacle == -1:
+                return
+            forward[gap] = [first + (obstacle - 1) * stride] * size
+            gap_start = obstacle + 1
+
+    def next_stop(self, cell: int, direction: int, obstacle: int = EXIT) -> int:
+        """Return where the guard stops, with an optional extra obstacle.
+
+        The extra obstacle only matters if it is in the same row or column,
+        ahead of the guard and no further than the stop from the table.
+        """
+        stop = self.stops[direction][cell]
+        if obstacle == EXIT:
+            return stop
+
+        step = self.steps[direction]
+        if direction % 2:
+            in_line = cell // self.width == obstacle // self.width
+        else:
+            in_line = cell % self.width == obstacle % self.width
+        if (
+            in_line
+            and (obstacle - cell) * step > 0
+            and (stop == EXIT or (stop - obstacle) * step >= 0)
+        ):
+            return obstacle - step
+        return stop
+
+    def edge(self, cell: int, direction: int) -> int:
+        """Return the last cell on the map walking from 'cell'."""
+        x = cell % self.width
+        row_start = cell - x
+        return (
+            x,
+            row_start + self.width - 1,
+            (self.height - 1) * self.width + x,
+            row_start,
+        )[direction]
+
+    def next_generation(self) -> int:
+        """Start a fresh set of turns, without clearing the old ones."""
+        if self.generation == MAX_GENERATION:
+            self.turn_generations = array("I", bytes(len(self.turn_flags) * 4))
+            self.generation = 0
+        self.generation += 1
+        return self.generation
+
+    def seen_turn(self, cell: int, direction: int) -> bool:
+        """Record a turn, returning True if it was already made this time."""
+        bit = 1 << direction
+        if self.turn_generations[cell] != self.generation:
+            self.turn_generations[cell] = self.generation
+            self.turn_flags[cell] = bit
+            return False
+        if self.turn_flags[cell] & bit:
+            return True
+        self.turn_flags[cell] |= bit
+        return False
+
+    def walk_path(self, start: int) -> dict[int, tuple[int, int]]:
+        """Return every cell the guard visits, in the order first reached.
+
+        Each cell maps to the state (cell, direction) of the guard just before
+        it first stepped onto it. The start cell maps to the starting state.
+        """
+        path = {start: (start, 0)}
+        visited = bytearray(len(self.turn_flags))
+        visited[start] = 1
+        cell, direction = start, 0
+        self.next_generation()
+
+        while True:
+            stop = self.next_stop(cell, direction)
+            end = self.edge(cell, direction) if stop == EXIT else stop
+            step = self.steps[direction]
+            for next_cell in range(cell + step, end + step, step):
+                if not visited[next_cell]:
+                    visited[next_cell] = 1
+                    path[next_cell] = (next_cell - step, direction)
+            if stop == EXIT or self.seen_turn(stop, direction):
+                break
+            cell, direction = stop, (direction + 1) % 4
+
+        return path
+
+    def is_loop(self, start: int, direction: int, obstacle: int) -> bool:
+        """Return True if the guard gets stuck in a loop.
+
+        We only need to remember the turns, as any loop must have at least one.
+        This is 'seen_turn' written out in full, as it is the hottest loop.
+        """
+        generation = self.next_generation()
+        flags, generations = self.turn_flags, self.turn_generations
+        cell = start
+        while True:
+            self.jump_count += 1
+            cell = self.next_stop(cell, direction, obstacle)
+            if cell == EXIT:
+                return False
+            bit = 1 << direction
+            if generations[cell] != generation:
+                generations[cell] = generation
+                flags[cell] = bit
+            elif flags[cell] & bit:
+                return True
+            else:
+                flags[cell] |= bit
+            direction = (direction + 1) % 4
+
+
+def part1_jump(
+    dimensions: tuple[int, int],
+    start_pos: tuple[int, int],
+    grid: list[str],
+) -> int:
+    """Solve part 1, jumping from turn to turn."""
+    table = JumpTable(dimensions, grid)
+    start = start_pos[1] * dimensions[0] + start_pos[0]
+    return len(table.walk_path(start))
+
+
+def count_loop_obstacles(
+    table: JumpTable, start: int, *, resume: bool = True
+) -> tuple[int, int]:
+    """Return how many obstacles put the guard in a loop, and the jumps taken.
+
+    An obstacle can only change the guard's route if it is on it, so we just
+    try each cell of the original path. With 'resume', each check carries on
+    from just before the guard first reached the obstacle, as the route up to
+    there is the same. Otherwise it starts from the beginning each time.
+    """
+    table.jump_count = 0
+    loops = 0
+    path = table.walk_path(start)
+    for obstacle, (cell, direction) in islice(path.items(), 1, None):
+        if resume:
+            loops += table.is_loop(cell, direction, obstacle)
+        else:
+            loops += table.is_loop(start, 0, obstacle)
+    return loops, table.jump_count
+
+
+def part2_jump(
+    dimensions: tuple[int, int],
+    start_pos: tuple[int, int],
+    grid: list[str],
+) -> int:
+    """Solve part 2, jumping from turn to turn, starting each check afresh."""
+    table = JumpTable(dimensions, grid)
+    start = start_pos[1] * dimensions[0] + start_pos[0]
+    return count_loop_obstacles(table, start, resume=False)[0]
+
+
+def part2_resume(
+    dimensions: tuple[int, int],
+    start_pos: tuple[int, int],
+    grid: list[str],
+) -> int:
+    """Solve part 2, resuming each check from just before the obstacle."""
+    table = JumpTable(dimensions, grid)
+    start = start_pos[1] * dimensions[0] + start_pos[0]
+    return count_loop_obstacles(table, start)[0]
+
+
+def init_worker(dimensions: tuple[int, int], grid: list[str]) -> None:
+    """Build the jump table once in each worker process."""
+    global worker_table  # noqa: PLW0603
+    worker_table = JumpTable(dimensions, grid)
+
+
+def count_loops(checks: list[tuple[int, int, int]]) -> int:
+    """Count the loops in a chunk of (obstacle, cell, direction) checks.
+
+    This runs in a worker process, using the table from 'init_worker'.
+    """
+    if worker_table is None:
+        msg = "The worker has not been initialised"
+        raise RuntimeError(msg)
+    return sum(
+        worker_table.is_loop(cell, direction, obstacle)
+        for obstacle, cell, direction in checks
+    )
+
+
+def part2_parallel(
+    dimensions: tuple[int, int],
+    start_pos: tuple[int, int],
+    grid: list[str],
+    workers: int | None = None,
+) -> int:
+    """Solve part 2, sharing the obstacle checks across worker processes.
+
+    The grid is only sent to each worker once, then the checks are handed out
+    in chunks. Each check resumes from just before the obstacle as in
+    'part2_resume'.
+    """
+    table = JumpTable(dimensions, grid)
+    start = start_pos[1] * dimensions[0] + start_pos[0]
+    path = table.walk_path(start)
+    checks = [
+        (obstacle, cell, direction)
+        for obstacle, (cell, direction) in islice(path.items(), 1, None)
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, len(checks) // (workers * 8))
+    chunks = [
+        checks[index : index + chunk_size]
+        for index in range(0, len(checks), chunk_size)
+    ]
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(dimensions, grid),
+    ) as executor:
+        return sum(executor.map(count_loops, chunks))
+
+
+def generate_map(size: int, density: float = 0.05, seed: int = 2024) -> str:
+    """Generate a square map of random obstacles, the guard in the middle.
+
+    Maps where the guard is already stuck in a loop are thrown away, as the
+    original part 1 would never finish.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    start = (size // 2) * size + size // 2
+    while True:
+        rows = [
+            ["#" if rng.random() < density else "." for _ in range(size)]
+            for _ in range(size)
+        ]
+        rows[size // 2][size // 2] = "^"
+        grid = ["".join(row) for row in rows]
+        if not JumpTable((size, size), grid).is_loop(start, 0, EXIT):
+            return "\n".join(grid)
+
+
+def benchmark(size: int = 1000, density: float = 0.02) -> None:
+    """Compare the original and jump table versions on a generated map."""
+    dimensions, start_pos, grid = get_data(generate_map(size, density))
+
+    solutions: dict[
+        str,
+        Callable[[tuple[int, int], tuple[int, int], list[str]], int],
+    ] = {
+        "part1": part1,
+        "part1_jump": part1_jump,
+        "part2": part2,
+        "part2_jump": part2_jump,
+        "part2_resume": part2_resume,
+    }
+
+    print(f"Guarding a {size}x{size} map")
+    for name, solution in solutions.items():
+        start_time = time.perf_counter()
+        result = solution(dimensions, start_pos, grid)
+        elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+        print(f"{name:>12} : {elapsed_time_ms:10.3f} ms ({result})")
+
+    table = JumpTable(dimensions, grid)
+    start = start_pos[1] * dimensions[0] + start_pos[0]
+    for resume in (False, True):
+        jumps = count_loop_obstacles(table, start, resume=resume)[1]
+        print(f"resume={resume!s:<5} : {jumps} jumps simulated")
+
+    benchmark_parallel()
+
+
+def benchmark_parallel(size: int = 2000, density: float = 0.02) -> None:
+    """Time 'part2_parallel' on a big map with more and more workers."""
+    dimensions, start_pos, grid = get_data(generate_map(size, density))
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, cpus} | {2**n for n in range(cpus.bit_length())})
+
+    print(f"\nGuarding a {size}x{size} map with {cpus} CPUs")
+    base_time_ms = 0.0
+    for workers in worker_counts:
+        start_time = time.perf_counter()
+        result = part2_parallel(dimensions, start_pos, grid, workers)
+        elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+        base_time_ms = base_time_ms or elapsed_time_ms
+        print(
+            f"{workers:>3} workers : {elapsed_time_ms:10.3f} ms ({result}) "
+            f"x{base_time_ms / elapsed_time_ms:.2f}"
+        )
+
+
 test_data = """
 ....#.....
 .........#
@@ -176,15 +556,18 @@ def main() -> None:
     dimensions, start_pos, grid = get_data()
 
     # Part 1 - answer for me is 5129
-    result1 = part1(dimensions, start_pos, grid)
+    result1 = part1_jump(dimensions, start_pos, grid)
     print(f"Part 1: The guard will visit {result1} distinct positions.")
 
     # Part 2 - answer for me is 1888
-    result2 = part2(dimensions, start_pos, grid)
+    result2 = part2_resume(dimensions, start_pos, grid)
     print(
         f"Part 2: We can find {result2} different positions to block so as to put the guard in a loop."
     )
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
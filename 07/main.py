@@ -1,12 +1,32 @@
-"""AOC 2024 - Day 7: Bridge Repair."""
+"""AOC 2024 - Day 7: Bridge Repair.
+
+Originally every combination of operators was tried from left to right, which
+is 3^n for part 2. Now the equations are solved backwards from the target:
+the last number must have been added, multiplied or concatenated on, so we
+subtract it, divide by it or strip it off the end, and give up on any branch
+where that can't work. Most branches die after a step or two.
+
+Operators live in a registry, each with a function to apply it and optionally
+one to undo it. A solver is built once per set of operators, using the
+backward search if every operator can be undone, and otherwise working
+forwards through the set of reachable values. This makes it easy to try out
+other operators, such as subtraction, XOR or OR.
+
+For workloads where many equations start with the same numbers, there is also
+'ReachableCache', an LRU cache of the values each prefix can reach. Run with
+'--bench' to compare it with 'get_solver' on a generated workload.
+"""
 
 from __future__ import annotations
 
+import random
+import sys
 import time
-from functools import wraps
+from collections import OrderedDict
+from functools import lru_cache, wraps
 from itertools import product
 from pathlib import Path
-from typing import TYPE_CHECKING, Callable, ParamSpec, TypeVar
+from typing import TYPE_CHECKING, Callable, NamedTuple, ParamSpec, TypeVar
 
 if TYPE_CHECKING:
     from collections.abc import Iterable
@@ -14,6 +34,28 @@ if TYPE_CHECKING:
 P = ParamSpec("P")
 R = TypeVar("R")
 
+Solver = Callable[[int, list[int]], bool]
+
+
+class Operator(NamedTuple):
+    """An operator that can be used between the numbers of an equation.
+
+    'apply' combines the result so far with the next number. 'undo' takes a
+    result and the number that was last combined into it, returning what the
+    result must have been before, or None if that's impossible. 'grows' means
+    it never makes the result smaller (for positive numbers), so any partial
+    result above the target (or below zero working backwards) can be dropped.
+    """
+
+    symbol: str
+    apply: Callable[[int, int], int]
+    undo: Callable[[int, int], int | None] | None = None
+    grows: bool = False
+
+
+# all the operators we know about, keyed by their symbol
+OPERATORS: dict[str, Operator] = {}
+
 
 def timer(func: Callable[P, R]) -> Callable[P, R]:
     """Measure the execution time of a function in milliseconds.
@@ -80,6 +122,284 @@ def is_valid_equation(target: int, numbers: list[int], operators: list[str]) ->
     return False
 
 
+def can_produce(target: int, numbers: list[int], operators: list[str]) -> bool:
+    """Check if the target value can be produced, working back from the end.
+
+    Everything is non-negative, so each partial result is at most the target.
+    To undo '+' the target must be at least the number, to undo '*' it must
+    divide exactly, and to undo '||' the target must end with its digits. All
+    in integer maths, with no conversion to strings.
+    """
+    use_add = "+" in operators
+    use_multiply = "*" in operators
+    use_concat = "||" in operators
+
+    def solve(value: int, index: int) -> bool:
+        num = numbers[index]
+        if index == 0:
+            return value == num
+
+        if use_add and value >= num and solve(value - num, index - 1):
+            return True
+
+        if use_multiply:
+            if num == 0:
+                # anything times zero is zero, so the rest doesn't matter
+                if value == 0:
+                    return True
+            elif value % num == 0 and solve(value // num, index - 1):
+                return True
+
+        if use_concat:
+            power_of_10 = power_of_10_above(num)
+            if value % power_of_10 == num and solve(
+                value // power_of_10, index - 1
+            ):
+                return True
+
+        return False
+
+    return solve(target, len(numbers) - 1)
+
+
+def power_of_10_above(num: int) -> int:
+    """Return the smallest power of 10 greater than a non-negative number."""
+    power_of_10 = 10
+    while power_of_10 <= num:
+        power_of_10 *= 10
+    return power_of_10
+
+
+def concat(left: int, right: int) -> int:
+    """Concatenate the digits of two non-negative numbers."""
+    return left * power_of_10_above(right) + right
+
+
+def undo_add(result: int, num: int) -> int:
+    """Return what 'num' was added to."""
+    return result - num
+
+
+def undo_multiply(result: int, num: int) -> int | None:
+    """Return what 'num' multiplied, if it divides exactly."""
+    return result // num if num and result % num == 0 else None
+
+
+def undo_concat(result: int, num: int) -> int | None:
+    """Return what 'num' was concatenated on to, if the digits match."""
+    power_of_10 = power_of_10_above(num)
+    return result // power_of_10 if result % power_of_10 == num else None
+
+
+def register_operator(operator: Operator) -> None:
+    """Add an operator to the registry, or replace one with the same symbol.
+
+    Replacing '+', '*' or '||' means 'get_solver' stops using the hand-written
+    'can_produce' for them, and uses the new operator instead.
+    """
+    OPERATORS[operator.symbol] = operator
+    get_solver.cache_clear()
+
+
+@lru_cache
+def get_solver(symbols: tuple[str, ...]) -> Solver:
+    """Return the fastest solver for this set of operators.
+
+    '+', '*' and '||' (or any subset) have the hand-written 'can_produce', as
+    long as they are still the built-in operators. Any other set uses a
+    backward search if all the operators can be undone, or a forward search if
+    not. Either way the operators' functions are looked up here, once, rather
+    than at every step.
+    """
+    operators = [OPERATORS[symbol] for symbol in symbols]
+    prune = all(operator.grows for operator in operators)
+
+    if all(
+        OPERATORS[symbol] is BUILT_IN_OPERATORS.get(symbol)
+        for symbol in symbols
+    ):
+        symbol_list = list(symbols)
+        return lambda target, numbers: can_produce(target, numbers, symbol_list)
+
+    undos = [operator.undo for operator in operators]
+    if all(undos):
+        return make_backward_solver(
+            [undo for undo in undos if undo is not None], prune=prune
+        )
+
+    return make_forward_solver(
+        [operator.apply for operator in operators], prune=prune
+    )
+
+
+def make_backward_solver(
+    undos: list[Callable[[int, int], int | None]], *, prune: bool
+) -> Solver:
+    """Return a solver working back from the target, like 'can_produce'.
+
+    This assumes the numbers are positive, as they are in the puzzle.
+    """
+
+    def solver(target: int, numbers: list[int]) -> bool:
+        def solve(value: int, index: int) -> bool:
+            num = numbers[index]
+            if index == 0:
+                return value == num
+            for undo in undos:
+                previous = undo(value, num)
+                if (
+                    previous is not None
+                    and (previous >= 0 or not prune)
+                    and solve(previous, index - 1)
+                ):
+                    return True
+            return False
+
+        return solve(target, len(numbers) - 1)
+
+    return solver
+
+
+def make_forward_solver(
+    applies: list[Callable[[int, int], int]], *, prune: bool
+) -> Solver:
+    """Return a solver working forwards through every reachable value.
+
+    Keeping a set of values, rather than trying every combination, means
+    duplicates are only followed once.
+    """
+
+    def solver(target: int, numbers: list[int]) -> bool:
+        values = {numbers[0]}
+        for num in numbers[1:]:
+            values = {
+                apply(value, num) for value in values for apply in applies
+            }
+            if prune:
+                values = {value for value in values if value <= target}
+        return target in values
+
+    return solver
+
+
+# the operators 'can_produce' has built in, so it can stand in for them
+BUILT_IN_OPERATORS = {
+    "+": Operator("+", int.__add__, undo_add, grows=True),
+    "*": Operator("*", int.__mul__, undo_multiply, grows=True),
+    "||": Operator("||", concat, undo_concat, grows=True),
+}
+for built_in in BUILT_IN_OPERATORS.values():
+    register_operator(built_in)
+register_operator(Operator("-", int.__sub__, int.__add__))
+register_operator(Operator("^", int.__xor__, int.__xor__))
+# bitwise OR loses the bits both sides had, so it can't be undone
+register_operator(Operator("|", int.__or__, grows=True))
+
+
+class ReachableCache:
+    """LRU cache of the values reachable from the first few numbers.
+
+    Equations that start with the same numbers share the work of the forward
+    search over them. Only the first 'prefix_length' numbers come from the
+    cache, as the number of reachable values grows quickly. The rest are worked
+    back from the target, like 'make_backward_solver', until they meet the
+    cached values.
+
+    Entries are keyed on the operator symbols and the prefix, so one cache can
+    hold several operator sets, but they don't share anything: a prefix's
+    values with '+ * ||' have to be worked out afresh, not from its values
+    with '+ *'. So part 2 would get nothing from what part 1 cached, and
+    'part1' and 'part2' stick with 'get_solver'.
+    """
+
+    def __init__(self, maxsize: int = 100_000, prefix_length: int = 5) -> None:
+        """Create an empty cache holding up to 'maxsize' prefixes."""
+        self.maxsize = maxsize
+        self.prefix_length = prefix_length
+        self.entries: OrderedDict[
+            tuple[tuple[str, ...], tuple[int, ...]], frozenset[int]
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def reachable(
+        self, symbols: tuple[str, ...], prefix: tuple[int, ...]
+    ) -> frozenset[int]:
+        """Return every value the prefix can reach with these operators."""
+        key = (symbols, prefix)
+        values = self.entries.get(key)
+        if values is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return values
+
+        self.misses += 1
+        if len(prefix) == 1:
+            values = frozenset(prefix)
+        else:
+            num = prefix[-1]
+            values = frozenset(
+                OPERATORS[symbol].apply(value, num)
+                for value in self.reachable(symbols, prefix[:-1])
+                for symbol in symbols
+            )
+
+        self.entries[key] = values
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return values
+
+    def solver(self, symbols: tuple[str, ...]) -> Solver:
+        """Return a solver for these operators that uses the cache.
+
+        If an operator can't be undone, the values are carried forward from
+        the cached prefix instead, dropping any above the target when all the
+        operators grow. Like 'make_backward_solver', this assumes the numbers
+        are positive.
+        """
+        operators = [OPERATORS[symbol] for symbol in symbols]
+        prune = all(operator.grows for operator in operators)
+        undos = [operator.undo for operator in operators if operator.undo]
+        applies = [operator.apply for operator in operators]
+        backward = len(undos) == len(operators)
+
+        def solver(target: int, numbers: list[int]) -> bool:
+            split = max(1, min(self.prefix_length, len(numbers) - 1))
+            values = self.reachable(symbols, tuple(numbers[:split]))
+
+            if not backward:
+                for num in numbers[split:]:
+                    results = (
+                        apply(value, num)
+                        for value in values
+                        for apply in applies
+                    )
+                    values = frozenset(
+                        result
+                        for result in results
+                        if not prune or result <= target
+                    )
+                return target in values
+
+            def solve(value: int, index: int) -> bool:
+                if index < split:
+                    return value in values
+                num = numbers[index]
+                for undo in undos:
+                    previous = undo(value, num)
+                    if (
+                        previous is not None
+                        and (previous >= 0 or not prune)
+                        and solve(previous, index - 1)
+                    ):
+                        return True
+                return False
+
+            return solve(target, len(numbers) - 1)
+
+        return solver
+
+
 @timer
 def part1(
     data: Iterable[tuple[int, list[int]]],
@@ -91,9 +411,10 @@ def part1(
     """
     total = 0
     failed_equations = []
+    solver = get_solver(("+", "*"))  # Only + and *
 
     for target, numbers in data:
-        if is_valid_equation(target, numbers, ["+", "*"]):  # Only + and *
+        if solver(target, numbers):
             total += target
         else:
             failed_equations.append((target, numbers))  # Keep track of failed equations
@@ -108,12 +429,76 @@ def part2(failed_data: list[tuple[int, list[int]]]) -> int:
     We only work on the failed sets from the first part.
     """
     total = 0
+    solver = get_solver(("+", "*", "||"))  # Include ||
     for target, numbers in failed_data:
-        if is_valid_equation(target, numbers, ["+", "*", "||"]):  # Include ||
+        if solver(target, numbers):
             total += target
     return total
 
 
+def generate_workload(
+    equation_count: int = 20_000,
+    prefix_count: int = 200,
+    seed: int = 2024,
+) -> list[tuple[int, list[int]]]:
+    """Generate equations where many share the same first few numbers.
+
+    Each equation is one of a pool of prefixes plus a short random tail, and
+    about half of them are solvable.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    prefixes = [
+        [rng.randint(1, 99) for _ in range(rng.randint(5, 8))]
+        for _ in range(prefix_count)
+    ]
+    symbols = ["+", "*", "||"]
+
+    equations = []
+    for _ in range(equation_count):
+        numbers = rng.choice(prefixes) + [
+            rng.randint(1, 99) for _ in range(rng.randint(1, 3))
+        ]
+        target = numbers[0]
+        for num in numbers[1:]:
+            target = OPERATORS[rng.choice(symbols)].apply(target, num)
+        equations.append((target + rng.randint(0, 1), numbers))
+    return equations
+
+
+def benchmark(forward_count: int = 1_000) -> None:
+    """Compare the solvers with and without the reachable value cache.
+
+    The '|' operator can't be undone, so that set is a forward search through
+    the cached values. It is far slower than working backwards, so it's only
+    timed on the first 'forward_count' equations. The cache saves the work on
+    the prefix, but the values carried through the tail are most of the cost,
+    so it only gains a little there.
+    """
+    data = generate_workload()
+    cache = ReachableCache()
+
+    for symbols, equations in (
+        (("+", "*"), data),
+        (("+", "*", "||"), data),
+        (("+", "*", "|"), data[:forward_count]),
+    ):
+        for name, solver in (
+            ("get_solver", get_solver(symbols)),
+            ("ReachableCache", cache.solver(symbols)),
+        ):
+            start_time = time.perf_counter()
+            result = sum(
+                target
+                for target, numbers in equations
+                if solver(target, numbers)
+            )
+            elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+            label = f"{name} {' '.join(symbols)}"
+            print(f"{label:>25} : {elapsed_time_ms:10.3f} ms ({result})")
+
+    print(f"Cache : {cache.hits} hits, {cache.misses} misses")
+
+
 def main() -> None:
     """Run the AOC problems for Day 7."""
     data = get_data()
@@ -128,4 +513,7 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
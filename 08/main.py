@@ -1,25 +1,53 @@
-"""AOC 2024 - Day 8: Resonant Collinearity."""
+"""AOC 2024 - Day 8: Resonant Collinearity.
+
+The original solutions loop over every pair of antennas in Python, which is fine
+for the puzzle but slow once there are thousands of antennas of a frequency.
+The NumPy versions work on blocks of pairs at once: the pairs come from
+broadcasting the antenna positions against each other, the steps along each
+line from a vectorized gcd, and the antinodes are marked in a boolean grid
+rather than added to a set of tuples.
+
+Huge sparse maps are too big for a grid, so for those part 2 keeps each line
+as its first point, step and number of points, and counts the distinct points
+a band of rows at a time.
+
+Run with '--bench' to compare them on large generated maps.
+"""
 
 from __future__ import annotations
 
+import random
+import sys
 import time
 from collections import defaultdict
 from functools import wraps
 from pathlib import Path
 from typing import (
     Callable,
+    Iterator,
+    NamedTuple,
     ParamSpec,
     TypeAlias,
     TypedDict,
     TypeVar,
 )
 
+import numpy as np
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
 AntennaMap: TypeAlias = defaultdict[str, list[tuple[int, int]]]
 Bounds: TypeAlias = tuple[int, int]
 
+# the most antenna pairs, and line points, worked on at once by NumPy. Keeps
+# the memory use down for frequencies with lots of antennas.
+PAIR_BLOCK = 1 << 20
+POINT_BLOCK = 1 << 22
+
+# the most cells of the map 'count_points' keeps in memory at once
+BAND_CELLS = 1 << 23
+
 
 class DataDict(TypedDict):
     """Define typing for the get_data() function."""
@@ -155,6 +183,278 @@ def part2(data: DataDict) -> int:
     return len(antinodes)
 
 
+# ------------------------- faster large-map versions ------------------------ #
+def antenna_pairs(
+    positions: np.ndarray,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Yield every pair of antennas as two arrays of positions, in blocks.
+
+    Comparing the indexes of a block of antennas against all of them (by
+    broadcasting) gives the pairs in the upper triangle, so each pair comes up
+    once. A block is sized to hold at most 'PAIR_BLOCK' pairs.
+    """
+    count = len(positions)
+    indexes = np.arange(count)
+    block = max(1, PAIR_BLOCK // max(count, 1))
+
+    for start in range(0, count, block):
+        first, second = np.nonzero(
+            indexes[start : start + block, None] < indexes[None, :]
+        )
+        yield positions[first + start], positions[second]
+
+
+def steps_inside(
+    coords: np.ndarray, steps: np.ndarray, size: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return how many steps we can take forwards and backwards along one axis.
+
+    Every coordinate must already be inside. A step of 0 never leaves, so it
+    gets the largest possible number of steps, leaving the other axis to
+    decide.
+    """
+    distance = np.maximum(np.abs(steps), 1)
+    ahead = np.where(steps > 0, size - 1 - coords, coords) // distance
+    behind = np.where(steps > 0, coords, size - 1 - coords) // distance
+    still = steps == 0
+    never = np.iinfo(steps.dtype).max
+    return np.where(still, never, ahead), np.where(still, never, behind)
+
+
+def line_points(
+    starts: np.ndarray,
+    steps: np.ndarray,
+    first_steps: np.ndarray,
+    counts: np.ndarray,
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Yield the rows and columns of every point on a set of lines.
+
+    Line 'i' has the points 'starts[i] + k * steps[i]' for 'counts[i]' values
+    of 'k' from 'first_steps[i]' on. The lines have different lengths, so their
+    points are laid out end to end with 'np.repeat', at most about
+    'POINT_BLOCK' of them at a time.
+    """
+    ends = np.cumsum(counts)
+    line = 0
+    while line < len(counts):
+        done = ends[line - 1] if line else 0
+        stop = int(np.searchsorted(ends, done + POINT_BLOCK, side="right"))
+        stop = max(stop, line + 1)
+
+        block_counts = counts[line:stop]
+        owners = np.repeat(np.arange(stop - line), block_counts)
+        offsets = np.arange(int(block_counts.sum())) - np.repeat(
+            np.cumsum(block_counts) - block_counts, block_counts
+        )
+        k = first_steps[line:stop][owners] + offsets
+        yield (
+            starts[line:stop, 0][owners] + k * steps[line:stop, 0][owners],
+            starts[line:stop, 1][owners] + k * steps[line:stop, 1][owners],
+        )
+        line = stop
+
+
+@timer
+def part1_numpy(data: DataDict) -> int:
+    """Solve Part 1, marking the antinodes of blocks of pairs at once.
+
+    Each pair has an antinode beyond each antenna, 'a2 + (a2 - a1)' and
+    'a1 - (a2 - a1)'.
+    """
+    rows, cols = data["bounds"]
+    mask = np.zeros((rows, cols), dtype=bool)
+
+    for positions in data["antennas"].values():
+        for first, second in antenna_pairs(np.array(positions, dtype=np.int64)):
+            candidates = np.concatenate(
+                (2 * second - first, 2 * first - second)
+            )
+            inside = (
+                (candidates[:, 0] >= 0)
+                & (candidates[:, 0] < rows)
+                & (candidates[:, 1] >= 0)
+                & (candidates[:, 1] < cols)
+            )
+            mask[candidates[inside, 0], candidates[inside, 1]] = True
+
+    return int(np.count_nonzero(mask))
+
+
+@timer
+def part2_numpy(data: DataDict) -> int:
+    """Solve Part 2, marking the whole line through each pair at once.
+
+    The step along a line is the difference between the antennas divided by
+    its gcd. How far the line reaches each way from the first antenna is
+    worked out with integer division, rather than by walking it.
+    """
+    rows, cols = data["bounds"]
+    mask = np.zeros((rows, cols), dtype=bool)
+
+    for positions in data["antennas"].values():
+        for first, second in antenna_pairs(np.array(positions, dtype=np.int64)):
+            deltas = second - first
+            steps = deltas // np.gcd(deltas[:, 0], deltas[:, 1])[:, None]
+
+            row_ahead, row_behind = steps_inside(first[:, 0], steps[:, 0], rows)
+            col_ahead, col_behind = steps_inside(first[:, 1], steps[:, 1], cols)
+            behind = np.minimum(row_behind, col_behind)
+            counts = np.minimum(row_ahead, col_ahead) + behind + 1
+
+            for line_rows, line_cols in line_points(
+                first, steps, -behind, counts
+            ):
+                mask[line_rows, line_cols] = True
+
+    return int(np.count_nonzero(mask))
+
+
+class Lines(NamedTuple):
+    """The antinode lines of a map, as arrays with one entry per line.
+
+    Line 'i' has the points 'starts[i] + k * steps[i]', for 'k' from 0 up to
+    'counts[i] - 1'. Steps always point down the map, or right along a row,
+    so the start is the first point of the line inside the map.
+    """
+
+    starts: np.ndarray
+    steps: np.ndarray
+    counts: np.ndarray
+
+
+def get_lines(data: DataDict) -> Lines:
+    """Return every distinct antinode line of the map.
+
+    Each line is clipped to the map with integer division, like in
+    'part2_numpy', but we only keep where it starts and how many points it
+    has. Lines through more than two antennas come up once per pair, so the
+    duplicates are removed.
+    """
+    rows, cols = data["bounds"]
+    descriptors = [np.zeros((0, 5), dtype=np.int64)]
+
+    for positions in data["antennas"].values():
+        for first, second in antenna_pairs(np.array(positions, dtype=np.int64)):
+            deltas = second - first
+            steps = deltas // np.gcd(deltas[:, 0], deltas[:, 1])[:, None]
+            backwards = (steps[:, 0] < 0) | (
+                (steps[:, 0] == 0) & (steps[:, 1] < 0)
+            )
+            steps[backwards] *= -1
+
+            row_ahead, row_behind = steps_inside(first[:, 0], steps[:, 0], rows)
+            col_ahead, col_behind = steps_inside(first[:, 1], steps[:, 1], cols)
+            behind = np.minimum(row_behind, col_behind)
+            counts = np.minimum(row_ahead, col_ahead) + behind + 1
+            starts = first - behind[:, None] * steps
+
+            descriptors.append(np.column_stack((starts, steps, counts)))
+
+    unique = np.unique(np.concatenate(descriptors), axis=0)
+    return Lines(unique[:, :2], unique[:, 2:4], unique[:, 4])
+
+
+def count_points(lines: Lines, bounds: Bounds) -> int:
+    """Count the distinct points on the lines, without a grid of the map.
+
+    A line along a row covers all of it, so those rows are simply counted in
+    full and left out of the other lines. The points of the rest are sorted
+    into bands of rows, numbering their cells within the band, and each band
+    counts its distinct cells with 'np.unique'.
+    """
+    rows, cols = bounds
+    along_row = lines.steps[:, 0] == 0
+    full_rows = np.zeros(rows, dtype=bool)
+    full_rows[lines.starts[along_row, 0]] = True
+    total = int(np.count_nonzero(full_rows)) * cols
+
+    band_rows = max(1, BAND_CELLS // cols)
+    bands: defaultdict[int, list[np.ndarray]] = defaultdict(list)
+    counts = lines.counts[~along_row]
+
+    for point_rows, point_cols in line_points(
+        lines.starts[~along_row],
+        lines.steps[~along_row],
+        np.zeros_like(counts),
+        counts,
+    ):
+        keep = ~full_rows[point_rows]
+        point_bands, band_rows_left = np.divmod(point_rows[keep], band_rows)
+        cells = band_rows_left * cols + point_cols[keep]
+        if not len(cells):
+            continue
+
+        order = np.argsort(point_bands, kind="stable")
+        band_numbers, band_starts = np.unique(
+            point_bands[order], return_index=True
+        )
+        for band, band_cells in zip(
+            band_numbers, np.split(cells[order], band_starts[1:]), strict=True
+        ):
+            bands[int(band)].append(band_cells)
+
+    for band_parts in bands.values():
+        total += np.unique(np.concatenate(band_parts)).size
+
+    return total
+
+
+@timer
+def part2_sparse(data: DataDict) -> int:
+    """Solve Part 2 for a huge sparse map, using line descriptors."""
+    return count_points(get_lines(data), data["bounds"])
+
+
+def generate_map(
+    size: int,
+    frequencies: int,
+    antennas_per_frequency: int,
+    seed: int = 2024,
+) -> DataDict:
+    """Generate a square map with random antennas for benchmarking."""
+    rng = random.Random(seed)  # noqa: S311
+    cells = rng.sample(range(size * size), frequencies * antennas_per_frequency)
+
+    antennas: AntennaMap = defaultdict(list)
+    for index, cell in enumerate(cells):
+        frequency = chr(ord("A") + index % frequencies)
+        antennas[frequency].append(divmod(cell, size))
+
+    return {"antennas": antennas, "bounds": (size, size)}
+
+
+def benchmark(
+    size: int = 1000, frequencies: int = 4, antennas_per_frequency: int = 500
+) -> None:
+    """Compare the original and NumPy versions on a large generated map."""
+    data = generate_map(size, frequencies, antennas_per_frequency)
+    print(
+        f"{size}x{size} map, {frequencies} frequencies of "
+        f"{antennas_per_frequency} antennas"
+    )
+
+    for solution in (part1, part1_numpy, part2, part2_numpy, part2_sparse):
+        print(f"{solution.__name__} : {solution(data)}")
+
+    benchmark_sparse()
+
+
+def benchmark_sparse(
+    size: int = 100_000,
+    frequencies: int = 26,
+    antennas_per_frequency: int = 100,
+) -> None:
+    """Time part 2 on a huge sparse map, too big for a grid of it."""
+    data = generate_map(size, frequencies, antennas_per_frequency)
+    print(
+        f"\n{size}x{size} map, {frequencies} frequencies of "
+        f"{antennas_per_frequency} antennas"
+    )
+
+    for solution in (part2, part2_sparse):
+        print(f"{solution.__name__} : {solution(data)}")
+
+
 @timer
 def main() -> None:
     """Run the AOC problems for Day 8."""
@@ -171,7 +471,10 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
 
 # Timing on my machine:
 # -> get_data() took 0.085 ms
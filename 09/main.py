@@ -1,16 +1,50 @@
-"""AOC 2024 - Day 9: Disk Fragmenter."""
+"""AOC 2024 - Day 9: Disk Fragmenter.
+
+The original solutions expand the disk map into a list with one item per
+block. The extent versions keep each file as its id, start and length instead,
+so compacting moves (or splits) whole extents, and the checksum of each extent
+is worked out in one go as an arithmetic series. Their time depends on the
+number of files rather than the number of blocks.
+
+Where the blocks themselves are needed, 'parse_data_to_array' stores them in an
+'array' of 4 byte ints with -1 for free space, rather than a list of Python
+objects, and the checksum is a NumPy dot product.
+
+For part 2, 'part2_heaps' keeps the free spans in a min-heap of start positions
+for each length, so finding the leftmost span a file fits in is a look at the
+top of a few heaps rather than a scan of every span.
+
+Run with '--bench' to compare them on large generated disk maps.
+"""
 
 from __future__ import annotations
 
+import heapq
+import random
+import sys
 import time
+from array import array
 from bisect import bisect_left
 from functools import wraps
 from pathlib import Path
 from typing import Callable, ParamSpec, TypeVar
 
+import numpy as np
+
 P = ParamSpec("P")
 R = TypeVar("R")
 
+# files are a single digit long, so any span this long or more fits them all
+MAX_FILE_LENGTH = 9
+
+# marks a free block in the array block store
+FREE = -1
+
+# blocks per NumPy dot product. File ids are int32, so within a chunk each
+# offset times id is below 2**15 * 2**31, and the chunk's 2**15 of them add up
+# to less than 2**61, well inside int64
+CHECKSUM_CHUNK = 1 << 15
+
 
 class FileInfo:
     """Structure to hold info for each file."""
@@ -211,21 +245,279 @@ def part2(data: list[tuple[int, int]]) -> int:
     )
 
 
+# ------------------------------- array versions ----------------------------- #
+def parse_data_to_array(data: list[tuple[int, int]]) -> array[int]:
+    """Parse the data into the block layout, as an array of file ids.
+
+    Free blocks are 'FREE' (-1). Each block takes 4 bytes, where the list
+    version needs an 8 byte pointer to an object for each. NumPy repeats each
+    id (or 'FREE') by its size, to build it without a loop, and the array is
+    filled straight from NumPy's buffer, without a copy in between.
+    """
+    sizes = np.array(data, dtype=np.int64).ravel()  # file, free, file, ...
+    values = np.full(len(sizes), FREE, dtype=np.int32)
+    values[::2] = np.arange(len(data))
+
+    blocks = array("i")
+    blocks.frombytes(np.repeat(values, sizes).data.cast("B"))
+    return blocks
+
+
+def array_checksum(blocks: array[int]) -> int:
+    """Return the checksum of an array of blocks, skipping the free ones.
+
+    The sum of position times file id is done in chunks. Each position is the
+    chunk's start plus an offset, so a chunk adds 'start' times the sum of its
+    ids, as a Python int, plus a dot product of the ids with the offsets,
+    which is small enough for int64 however big the disk is.
+    """
+    file_ids = np.frombuffer(blocks, dtype=np.int32)
+    offsets = np.arange(CHECKSUM_CHUNK, dtype=np.int64)
+    checksum = 0
+    for start in range(0, len(file_ids), CHECKSUM_CHUNK):
+        chunk = file_ids[start : start + CHECKSUM_CHUNK].astype(np.int64)
+        chunk[chunk == FREE] = 0
+        checksum += start * int(chunk.sum())
+        checksum += int(np.dot(offsets[: len(chunk)], chunk))
+    return checksum
+
+
+@timer
+def part1_array(data: list[tuple[int, int]]) -> int:
+    """Compact the files in an array of blocks, then calculate the checksum.
+
+    The same two pointers as 'part1', but 'array.index' finds the next free
+    block from the left in C.
+    """
+    blocks = parse_data_to_array(data)
+    read_ptr = len(blocks) - 1
+
+    try:
+        write_ptr = blocks.index(FREE)
+        while True:
+            while read_ptr > write_ptr and blocks[read_ptr] == FREE:
+                read_ptr -= 1
+            if read_ptr <= write_ptr:
+                break
+            blocks[write_ptr] = blocks[read_ptr]
+            blocks[read_ptr] = FREE
+            write_ptr = blocks.index(FREE, write_ptr + 1)
+    except ValueError:
+        pass  # no free blocks left to fill
+
+    return array_checksum(blocks)
+
+
+# ------------------------------ extent versions ----------------------------- #
+def get_extents(
+    data: list[tuple[int, int]],
+) -> tuple[list[tuple[int, int, int]], list[tuple[int, int]]]:
+    """Return the files as (id, start, length) and the free spans.
+
+    The free spans are (start, length), and both are in disk order. Empty
+    files and spans are left out, so the spans either side of an empty file
+    become one.
+    """
+    files: list[tuple[int, int, int]] = []
+    free_spans: list[tuple[int, int]] = []
+
+    position = 0
+    for file_id, (file_size, free_space) in enumerate(data):
+        span_length = free_space
+        if file_size:
+            files.append((file_id, position, file_size))
+            position += file_size
+        elif free_space and free_spans and sum(free_spans[-1]) == position:
+            # merge with the span before, as nothing is between them now
+            position, previous_length = free_spans.pop()
+            span_length += previous_length
+        if span_length:
+            free_spans.append((position, span_length))
+            position += span_length
+
+    return files, free_spans
+
+
+def extent_checksum(file_id: int, start: int, length: int) -> int:
+    """Return the checksum of 'length' blocks of a file from 'start'.
+
+    The positions are an arithmetic series, so their sum is the length times
+    the average of the first and last position.
+    """
+    return file_id * length * (2 * start + length - 1) // 2
+
+
+@timer
+def part1_extents(data: list[tuple[int, int]]) -> int:
+    """Compact the files block by block, moving parts of extents at a time.
+
+    Each free span (from the left) is filled from the end of the last file.
+    That either fills the span, moving on to the next one, or empties the file,
+    moving on to the file before it.
+    """
+    files, free_spans = get_extents(data)
+    checksum = 0
+    last = len(files) - 1
+
+    for span_start, span_length in free_spans:
+        start, length = span_start, span_length
+        while length and last >= 0 and files[last][1] > start:
+            file_id, file_start, file_length = files[last]
+            moved = min(length, file_length)
+            checksum += extent_checksum(file_id, start, moved)
+            start += moved
+            length -= moved
+
+            if moved == file_length:
+                last -= 1
+            else:
+                # the blocks come from the end, so the rest stays put
+                files[last] = (file_id, file_start, file_length - moved)
+
+        if last < 0 or files[last][1] <= start:
+            break
+
+    return checksum + sum(
+        extent_checksum(*file_extent) for file_extent in files[: last + 1]
+    )
+
+
+@timer
+def part2_extents(data: list[tuple[int, int]]) -> int:
+    """Compact whole files by moving each to the leftmost span it fits in.
+
+    The same as 'part2', but the free spans just shrink from the front as files
+    move into them, and the blocks are never written out. Space freed by a
+    moved file can be ignored, as only files to the left of it are left to
+    move, and so can any spans to the right of the file being moved.
+    """
+    files, free_spans = get_extents(data)
+    checksum = 0
+
+    for file_id, file_start, file_length in reversed(files):
+        # spans right of this file are no use to it, or any file left to move
+        while free_spans and free_spans[-1][0] > file_start:
+            free_spans.pop()
+
+        start = file_start
+        for index, (span_start, span_length) in enumerate(free_spans):
+            if span_length >= file_length:
+                start = span_start
+                if span_length == file_length:
+                    del free_spans[index]
+                else:
+                    free_spans[index] = (
+                        span_start + file_length,
+                        span_length - file_length,
+                    )
+                break
+        checksum += extent_checksum(file_id, start, file_length)
+
+    return checksum
+
+
+@timer
+def part2_heaps(data: list[tuple[int, int]]) -> int:
+    """Compact whole files, finding the leftmost span from a heap per length.
+
+    Spans of 9 blocks or more all fit any file, so they share the last heap.
+    A file of length 'n' can go in the span at the top of any heap from 'n'
+    up, so the leftmost of those few is the one we want. What is left of a
+    span after a file moves in goes back in the heap for its new length.
+    """
+    files, free_spans = get_extents(data)
+    heaps: list[list[tuple[int, int]]] = [
+        [] for _ in range(MAX_FILE_LENGTH + 1)
+    ]
+    for span in free_spans:  # already in order, so each heap is valid
+        heaps[min(span[1], MAX_FILE_LENGTH)].append(span)
+
+    checksum = 0
+    for file_id, file_start, file_length in reversed(files):
+        start = file_start
+        best = None
+        for heap in heaps[file_length:]:
+            if heap and heap[0][0] < start:
+                start = heap[0][0]
+                best = heap
+
+        if best is not None:
+            span_start, span_length = heapq.heappop(best)
+            if span_length > file_length:
+                left = span_length - file_length
+                heapq.heappush(
+                    heaps[min(left, MAX_FILE_LENGTH)],
+                    (span_start + file_length, left),
+                )
+        checksum += extent_checksum(file_id, start, file_length)
+
+    return checksum
+
+
+def generate_disk_map(file_count: int, seed: int = 2024) -> str:
+    """Generate a disk map with 'file_count' files for benchmarking."""
+    rng = random.Random(seed)  # noqa: S311
+    digits = [
+        f"{rng.randint(1, 9)}{rng.randint(0, 9)}" for _ in range(file_count)
+    ]
+    return "".join(digits)[:-1]
+
+
+def benchmark(
+    file_count: int = 500_000, part2_file_count: int = 10_000
+) -> None:
+    """Compare the list, array and extent versions on generated disk maps.
+
+    The original part 2 is far slower, so it gets a smaller map.
+    """
+    data = get_data(generate_disk_map(file_count))
+    print(f"Part 1 with {file_count} files")
+    print(f"  part1 : {part1(data)}")
+    print(f"  part1_array : {part1_array(data)}")
+    print(f"  part1_extents : {part1_extents(data)}")
+
+    data = get_data(generate_disk_map(part2_file_count))
+    print(f"Part 2 with {part2_file_count} files")
+    print(f"  part2 : {part2(data)}")
+    print(f"  part2_extents : {part2_extents(data)}")
+    print(f"  part2_heaps : {part2_heaps(data)}")
+
+    benchmark_heaps()
+
+
+def benchmark_heaps(file_count: int = 1_000_000) -> None:
+    """Time the heap version of part 2 on a map with a million files.
+
+    Scanning the spans is too slow for this many, so it only gets a tenth.
+    """
+    data = get_data(generate_disk_map(file_count // 10))
+    print(f"Part 2 with {file_count // 10} files")
+    print(f"  part2_extents : {part2_extents(data)}")
+    print(f"  part2_heaps : {part2_heaps(data)}")
+
+    data = get_data(generate_disk_map(file_count))
+    print(f"Part 2 with {file_count} files")
+    print(f"  part2_heaps : {part2_heaps(data)}")
+
+
 def main() -> None:
     """Run the AOC problems for Day 9."""
     data = get_data()
 
     # Part 1 - answer for me is 6259790630969
-    result1 = part1(data)
+    result1 = part1_extents(data)
     print(f"Part 1: {result1}")
 
     # Part 2 - answer for me is 6289564433984
-    result2 = part2(data)
+    result2 = part2_heaps(data)
     print(f"Part 2: {result2}")
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
 
 # ---------------------------------- Timings --------------------------------- #
 # part1() : 7.860 ms
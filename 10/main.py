@@ -1,12 +1,29 @@
-"""AOC 2024 - Day 10: Hoof It."""
+"""AOC 2024 - Day 10: Hoof It.
+
+The original solution runs a search from every trailhead, so trails shared by
+several trailheads are walked again for each. 'solve_levels' instead works
+through the cells one height at a time, from 9 down to 0. Each cell's rating is
+the sum of the ratings of the cells one higher next to it, and the 9s it can
+reach are the union of theirs, kept as a bitset in a Python int. Every cell is
+visited once, however many trailheads there are.
+
+For part 2 on very large maps, 'ratings_numpy' does the same for the ratings
+with whole-map NumPy arrays, one height at a time.
+
+Run with '--bench' to compare them on a large generated map.
+"""
 
 from __future__ import annotations
 
+import random
+import sys
 import time
 from functools import wraps
 from pathlib import Path
 from typing import TYPE_CHECKING, ParamSpec, TypeVar
 
+import numpy as np
+
 if TYPE_CHECKING:
     from collections.abc import Callable
 
@@ -15,6 +32,13 @@ R = TypeVar("R")
 
 END_OF_TRAIL = 9
 
+# surrounds the map in 'solve_levels', no height is ever one more than it
+EDGE = -2
+
+# a trail is at most 9 steps, so the 9s any cell can reach are all within a
+# window this size. 9s the same distance apart can share a bit in the bitsets.
+BIT_WINDOW = 2 * END_OF_TRAIL + 1
+
 
 def timer(func: Callable[P, R]) -> Callable[P, R]:
     """Measure the execution time of a function in milliseconds.
@@ -88,12 +112,119 @@ def solve(data: list[list[int]]) -> tuple[int, int]:
     return part1_sum, part2_sum
 
 
+@timer
+def solve_levels(data: list[list[int]]) -> tuple[int, int]:
+    """Solve both parts, working down from the 9s one height at a time.
+
+    The map is flattened with a border of 'EDGE' around it, so the neighbours
+    of any cell are always a fixed offset away and need no bounds checks. A
+    cell's score is the number of bits in its set. Giving every 9 its own bit
+    would make the sets huge on a big map, but the bit only has to differ from
+    the other 9s nearby, so it comes from the 9's position within a repeating
+    'BIT_WINDOW' square. The sets never have more than 361 bits.
+    """
+    width = len(data[0]) + 2
+    border = [EDGE] * width
+    heights = border.copy()
+    for line in data:
+        heights += [EDGE, *line, EDGE]
+    heights += border
+
+    cells_at: list[list[int]] = [[] for _ in range(END_OF_TRAIL + 1)]
+    for cell, height in enumerate(heights):
+        if 0 <= height <= END_OF_TRAIL:
+            cells_at[height].append(cell)
+
+    ratings = [0] * len(heights)
+    reachable = [0] * len(heights)  # bitset of the 9s each cell can reach
+    for cell in cells_at[END_OF_TRAIL]:
+        row, col = divmod(cell, width)
+        ratings[cell] = 1
+        reachable[cell] = 1 << (
+            row % BIT_WINDOW * BIT_WINDOW + col % BIT_WINDOW
+        )
+
+    offsets = (-width, 1, width, -1)
+    for height in range(END_OF_TRAIL - 1, -1, -1):
+        for cell in cells_at[height]:
+            rating = 0
+            nines = 0
+            for offset in offsets:
+                neighbour = cell + offset
+                if heights[neighbour] == height + 1:
+                    rating += ratings[neighbour]
+                    nines |= reachable[neighbour]
+            ratings[cell] = rating
+            reachable[cell] = nines
+
+    trailheads = cells_at[0]
+    return (
+        sum(reachable[cell].bit_count() for cell in trailheads),
+        sum(ratings[cell] for cell in trailheads),
+    )
+
+
+@timer
+def ratings_numpy(data: list[list[int]]) -> int:
+    """Return the sum of the trailhead ratings, a whole height at a time.
+
+    'counts' holds the number of trails to a 9 from each cell at the current
+    height, and nothing anywhere else, so the count for each cell one lower is
+    just the sum of its four shifted neighbours. The border of zeros around
+    the map stands in for the cells off the edge.
+    """
+    heights = np.full((len(data) + 2, len(data[0]) + 2), EDGE, dtype=np.int8)
+    heights[1:-1, 1:-1] = np.array(data, dtype=np.int8)
+
+    # no cell has more than 4 * 3**8 trails, so 32 bits is plenty
+    counts = (heights == END_OF_TRAIL).astype(np.int32)
+    neighbours = np.zeros_like(counts)
+    inside = neighbours[1:-1, 1:-1]
+    for height in range(END_OF_TRAIL - 1, -1, -1):
+        np.add(counts[:-2, 1:-1], counts[2:, 1:-1], out=inside)
+        inside += counts[1:-1, :-2]
+        inside += counts[1:-1, 2:]
+        np.multiply(neighbours, heights == height, out=counts)
+
+    return int(counts.sum(dtype=np.int64))
+
+
+def generate_map(size: int, seed: int = 2024) -> list[list[int]]:
+    """Generate a square map with lots of trails, for benchmarking.
+
+    The heights climb diagonally, with random steps in them, so there are
+    plenty of trails and they share a lot of their paths.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    return [
+        [
+            (row + col + step) % 10
+            for col, step in enumerate(rng.choices((0, 0, 1), k=size))
+        ]
+        for row in range(size)
+    ]
+
+
+def benchmark(size: int = 1000, numpy_size: int = 5000) -> None:
+    """Compare the search and height by height versions on large maps."""
+    data = generate_map(size)
+    print(f"{size}x{size} map")
+    print(f"  solve : {solve(data)}")
+    print(f"  solve_levels : {solve_levels(data)}")
+    print(f"  ratings_numpy : {ratings_numpy(data)}")
+
+    data = generate_map(numpy_size)
+    print(f"{numpy_size}x{numpy_size} map")
+    print(f"  solve_levels : {solve_levels(data)}")
+    print(f"  ratings_numpy : {ratings_numpy(data)}")
+
+
 @timer
 def main() -> None:
     """Run the AOC problems for Day 10."""
     data = get_data()
 
-    part1_result, part2_result = solve(data)
+    part1_result, part2_result = solve_levels(data)
     print(
         f"Part 1: Sum of all trialhead scores is {part1_result}"
     )  # 717 for me
@@ -103,7 +234,10 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
 
 # ---------------------------------- timings --------------------------------- #
 # ------------- Run on an i7-14700K with SSD and DDR5-6000 memory ------------ #
@@ -1,17 +1,56 @@
-"""AOC 2024 - Day 11: Plutonian Pebbles."""
+"""AOC 2024 - Day 11: Plutonian Pebbles.
+
+The order of the stones never matters, only how many there are of each value,
+and there are only a few thousand different values. So as well as the original
+recursive count, there is 'count_stones', which keeps a count for each value
+and transforms each value once per blink. It needs no recursion, so it can run
+for thousands of blinks, and its memory depends on the number of values.
+
+The values reachable from the starting stones form a closed set, so
+'TransitionGraph' finds them (and what each becomes) once, and jumps ahead by
+repeatedly squaring the transition matrix, in a number of steps logarithmic in
+the blinks. The exact counts grow by about 0.18 digits a blink, so for huge
+numbers of blinks they can be taken modulo some number instead.
+
+The stones can be kept as strings or ints, with a backend for each (see
+'BACKENDS'). The integer one counts digits exactly against a table of powers
+of 10, rather than with 'math.log10', and the lookup one also keeps the
+transforms of small values in a table, and is the one 'main' uses. When
+benchmarking, 'pick_backend' times them all, checks they agree, and picks the
+fastest.
+
+For batch runs over many inputs, 'BlinkCache' is a version of the recursive
+count's cache with a size limit, hit and miss counts, and the option of saving
+it to a file to be loaded again by later runs or other workers.
+
+Run with '--bench' to compare them all with the recursive version.
+"""
 
 from __future__ import annotations
 
+import json
+import random
+import sys
+import tempfile
 import time
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
 from functools import cache, wraps
 from pathlib import Path
-from typing import TYPE_CHECKING, ParamSpec, TypeVar
+from typing import TYPE_CHECKING, Any, NamedTuple, ParamSpec, TypeVar
 
 if TYPE_CHECKING:
-    from collections.abc import Callable
+    from collections.abc import Callable, Hashable, Iterable
 
 P = ParamSpec("P")
 R = TypeVar("R")
+S = TypeVar("S", bound="Hashable")
+
+# 10, 100, 1000... for counting digits. Bigger stones are counted as strings.
+POWERS_OF_10 = [10**power for power in range(1, 40)]
+
+# stones below this have their transforms in the lookup table
+LOOKUP_SIZE = 10_000
 
 
 def timer(func: Callable[P, R]) -> Callable[P, R]:
@@ -61,6 +100,51 @@ def transform_stone(stone: str) -> list[str]:
     return [str(val)]
 
 
+def count_digits(stone: int) -> int:
+    """Return the number of digits in a non-negative int, exactly."""
+    if stone < POWERS_OF_10[-1]:
+        return bisect_right(POWERS_OF_10, stone) + 1
+    return len(str(stone))
+
+
+def transform_integer(stone: int) -> list[int]:
+    """Transform the given stone using the rules, using integer maths."""
+    if stone == 0:
+        return [1]
+
+    length = count_digits(stone)
+    if length % 2 == 0:
+        # split into the top and bottom half of the digits
+        return list(divmod(stone, 10 ** (length // 2)))
+
+    return [stone * 2024]
+
+
+LOOKUP_TABLE = [transform_integer(stone) for stone in range(LOOKUP_SIZE)]
+
+
+def transform_lookup(stone: int) -> list[int]:
+    """Transform the given stone, from the lookup table if it's small."""
+    if stone < LOOKUP_SIZE:
+        return LOOKUP_TABLE[stone]
+    return transform_integer(stone)
+
+
+class Backend(NamedTuple):
+    """How the stones are stored, and how they change on each blink."""
+
+    parse: Callable[[str], Any]
+    transform: Callable[[Any], list[Any]]
+
+
+BACKENDS = {
+    "string": Backend(str, transform_stone),
+    "integer": Backend(int, transform_integer),
+    "lookup": Backend(int, transform_lookup),
+}
+DEFAULT_BACKEND = "lookup"
+
+
 @cache
 def get_final_stone_count(stone: str, t: int) -> int:
     """Return the # of stones from a single stone after 't' blinks."""
@@ -73,34 +157,404 @@ def get_final_stone_count(stone: str, t: int) -> int:
     return total
 
 
+def blink(
+    stones: dict[S, int], transform: Callable[[S], list[S]]
+) -> dict[S, int]:
+    """Return the count of each stone value after one blink."""
+    new_stones: defaultdict[S, int] = defaultdict(int)
+    for stone, count in stones.items():
+        for new_stone in transform(stone):
+            new_stones[new_stone] += count
+    return new_stones
+
+
+def count_stones(
+    data: Iterable[S],
+    blinks: int,
+    transform: Callable[[S], list[S]],
+) -> int:
+    """Return the number of stones after 'blinks' blinks, counting by value.
+
+    Works for stones of any type, given the matching 'transform'.
+    """
+    stones: dict[S, int] = Counter(data)
+    for _ in range(blinks):
+        stones = blink(stones, transform)
+    return sum(stones.values())
+
+
+class BlinkCache:
+    """A bounded LRU cache of stone counts, keyed on (stone, blinks).
+
+    It does the same job as the '@cache' on 'get_final_stone_count', but keeps
+    at most 'maxsize' results, dropping the least recently used. It can be
+    saved as JSON and loaded again, so results can be shared between runs.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1_000_000,
+        transform: Callable[[Any], list[Any]] = transform_stone,
+    ) -> None:
+        """Create an empty cache, for stones changed by 'transform'."""
+        self.maxsize = maxsize
+        self.transform = transform
+        self.entries: OrderedDict[tuple[Any, int], int] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, stone: Any, blinks: int) -> int:  # noqa: ANN401
+        """Return the number of stones from a single stone after 'blinks'."""
+        if blinks == 0:
+            return 1
+
+        key = (stone, blinks)
+        total = self.entries.get(key)
+        if total is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return total
+
+        self.misses += 1
+        total = sum(
+            self.count(new_stone, blinks - 1)
+            for new_stone in self.transform(stone)
+        )
+        self.entries[key] = total
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return total
+
+    def save(self, path: Path) -> None:
+        """Save the cache to a JSON file, replacing it in one step.
+
+        Entries already in the file are kept too, as long as there's room
+        within 'maxsize' after this cache's own, so workers sharing a file keep
+        each other's results. They go first in the file, so when it's loaded,
+        this cache's entries count as the most recently used. The cache itself
+        isn't changed. The file is
+        written alongside and then renamed, so other processes never load a
+        half written cache. There is no lock though, so if two workers save at
+        the same moment, the entries only the first one had are lost.
+        """
+        entries = [
+            [stone, blinks, total]
+            for (stone, blinks), total in self.entries.items()
+        ]
+        room = self.maxsize - len(entries)
+        if room > 0 and path.exists():
+            with path.open() as saved:
+                others = [
+                    [stone, blinks, total]
+                    for stone, blinks, total in json.load(saved)
+                    if (stone, blinks) not in self.entries
+                ]
+            # the file is oldest first, so keep the newest, ahead of ours
+            entries = others[max(0, len(others) - room) :] + entries
+
+        file = tempfile.NamedTemporaryFile(  # noqa: SIM115
+            "w", dir=path.parent, suffix=".tmp", delete=False
+        )
+        try:
+            with file:
+                json.dump(entries, file)
+            Path(file.name).replace(path)
+        except BaseException:
+            # don't leave the half written file behind
+            Path(file.name).unlink(missing_ok=True)
+            raise
+
+    def load(self, path: Path) -> None:
+        """Add the entries saved in a JSON file, if it exists."""
+        if not path.exists():
+            return
+        with path.open() as file:
+            for stone, blinks, total in json.load(file):
+                self.entries[stone, blinks] = total
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+class TransitionGraph:
+    """Every stone value reachable from some starting stones, as a graph.
+
+    Each value gets an index, and 'children' holds the indexes of what it
+    becomes after one blink. As a matrix, row 'i' of the transition matrix for
+    'n' blinks says how many of each value a single stone 'i' becomes. The
+    matrices start sparse, so each row is a dict of index to count.
+
+    Squaring fills the matrix in, so each square costs up to the cube of the
+    number of values. That is fine for small sets, like the 76 values from
+    '125 17', but the few thousand from a real input are better off with
+    'count_stones'. The same goes for exact counts, which get so big that
+    multiplying them costs more than just blinking, so this is at its best
+    for counts modulo some number.
+    """
+
+    def __init__(
+        self,
+        stones: Iterable[str],
+        transform: Callable[[str], list[str]] = transform_stone,
+    ) -> None:
+        """Find every value reachable from the stones, and their children."""
+        self.values: list[str] = []
+        self.index: dict[str, int] = {}
+        self.children: list[list[int]] = []
+
+        for stone in stones:
+            self.add_value(stone)
+
+        # the values list grows as we go, until no new values turn up
+        while len(self.children) < len(self.values):
+            value = self.values[len(self.children)]
+            self.children.append(
+                [self.add_value(child) for child in transform(value)]
+            )
+
+    def add_value(self, value: str) -> int:
+        """Return the index of a value, giving it the next one if it's new."""
+        if value not in self.index:
+            self.index[value] = len(self.values)
+            self.values.append(value)
+        return self.index[value]
+
+    def counts_after(
+        self, blinks: int, modulus: int | None = None
+    ) -> list[int]:
+        """Return how many stones each value becomes after 'blinks' blinks.
+
+        Starting with a count of 1 for each value, we apply the transition
+        matrix for each power of 2 in 'blinks', squaring it as we go. Powers
+        of the same matrix can be applied in any order, so this is the same as
+        'blinks' single blinks.
+        """
+        counts = [1] * len(self.values)
+        power: list[dict[int, int]] = [
+            dict(Counter(children)) for children in self.children
+        ]
+
+        while blinks:
+            if blinks & 1:
+                counts = [
+                    sum(count * counts[child] for child, count in row.items())
+                    for row in power
+                ]
+                if modulus:
+                    counts = [count % modulus for count in counts]
+            blinks >>= 1
+            if blinks:
+                power = self.square(power, modulus)
+
+        return counts
+
+    @staticmethod
+    def square(
+        matrix: list[dict[int, int]], modulus: int | None = None
+    ) -> list[dict[int, int]]:
+        """Return the sparse matrix multiplied by itself."""
+        result = []
+        for row in matrix:
+            new_row: defaultdict[int, int] = defaultdict(int)
+            for middle, count in row.items():
+                for column, other_count in matrix[middle].items():
+                    new_row[column] += count * other_count
+            if modulus:
+                result.append({k: v % modulus for k, v in new_row.items()})
+            else:
+                result.append(dict(new_row))
+        return result
+
+    def count_stones(
+        self, stones: Iterable[str], blinks: int, modulus: int | None = None
+    ) -> int:
+        """Return the number of stones after 'blinks' blinks.
+
+        The stones must all be values in the graph.
+        """
+        counts = self.counts_after(blinks, modulus)
+        total = sum(counts[self.index[stone]] for stone in stones)
+        return total % modulus if modulus else total
+
+
+def count_with_backend(data: list[str], blinks: int, backend: str) -> int:
+    """Return the number of stones after 'blinks' blinks, using a backend."""
+    parse, transform = BACKENDS[backend]
+    return count_stones(map(parse, data), blinks, transform)
+
+
+def stone_totals(data: list[str], blinks: int, backend: str) -> list[int]:
+    """Return the number of stones after each blink, from 0 up to 'blinks'."""
+    parse, transform = BACKENDS[backend]
+    stones: dict[Any, int] = Counter(map(parse, data))
+    totals = [len(data)]
+    for _ in range(blinks):
+        stones = blink(stones, transform)
+        totals.append(sum(stones.values()))
+    return totals
+
+
+def pick_backend(data: list[str], blinks: int = 75) -> str:
+    """Return the name of the fastest backend that gets the right answers.
+
+    The string backend is the reference, so any backend that disagrees with
+    it after any number of blinks is never picked.
+    """
+    expected = stone_totals(data, blinks, "string")
+    timings = {}
+    for backend in BACKENDS:
+        start_time = time.perf_counter()
+        totals = stone_totals(data, blinks, backend)
+        if totals == expected:
+            timings[backend] = time.perf_counter() - start_time
+    return min(timings, key=timings.__getitem__)
+
+
 @timer
-def part1(data: list[str]) -> int:
+def part1(data: list[str], backend: str = "string") -> int:
     """Get the result after 25 blinks."""
-    return sum(get_final_stone_count(stone, 25) for stone in data)
+    return count_with_backend(data, 25, backend)
 
 
 @timer
-def part2(data: list[str]) -> int:
+def part2(data: list[str], backend: str = "string") -> int:
     """Get the result after 75 blinks."""
-    return sum(get_final_stone_count(stone, 75) for stone in data)
+    return count_with_backend(data, 75, backend)
+
+
+def generate_stones(count: int = 8, seed: int = 2024) -> list[str]:
+    """Generate some starting stones like the puzzle's, for benchmarking."""
+    rng = random.Random(seed)  # noqa: S311
+    return [str(rng.randint(0, 9_999_999)) for _ in range(count)]
+
+
+def benchmark(blinks: int = 75, many_blinks: int = 1000) -> None:
+    """Compare the recursive version and counting with each backend.
+
+    The recursive version needs a stack frame per blink, so only the counting
+    versions are run for 'many_blinks'. The recursive cache is cleared first,
+    so nothing is reused between runs.
+    """
+    data = generate_stones()
+
+    def recursive(count: int) -> int:
+        get_final_stone_count.cache_clear()
+        return sum(get_final_stone_count(stone, count) for stone in data)
+
+    def counting(backend: str) -> Callable[[int], int]:
+        return lambda count: count_with_backend(data, count, backend)
+
+    versions: dict[str, Callable[[int], int]] = {
+        "recursive strings": recursive,
+        **{f"counting {backend}": counting(backend) for backend in BACKENDS},
+    }
+
+    print(f"Starting stones: {' '.join(data)}")
+    for count in (blinks, many_blinks):
+        for name, version in versions.items():
+            if count > blinks and name.startswith("recursive"):
+                continue
+            start_time = time.perf_counter()
+            result = version(count)
+            elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+            digits = len(str(result))
+            print(
+                f"{name:>18} : {count:5} blinks {elapsed_time_ms:10.3f} ms "
+                f"({digits} digit result)"
+            )
+
+    print(f"pick_backend picked: {pick_backend(data)}")
+
+    benchmark_cache()
+    benchmark_graph()
+
+
+def benchmark_cache(blinks: int = 75, maxsize: int = 500_000) -> None:
+    """Time 'BlinkCache' on a few inputs, saving it and loading it each time.
+
+    Each input is a separate run with a fresh cache, loaded from the file the
+    previous one saved, so the later runs get most of their results from it.
+    """
+    print(f"\nBlinkCache with up to {maxsize} entries, {blinks} blinks")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "blink-cache.json"
+        for seed in range(3):
+            data = generate_stones(seed=seed)
+            cache = BlinkCache(maxsize)
+            cache.load(path)
+
+            start_time = time.perf_counter()
+            result = sum(cache.count(stone, blinks) for stone in data)
+            elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+            cache.save(path)
+
+            print(
+                f"{'run ' + str(seed + 1):>18} : {elapsed_time_ms:10.3f} ms "
+                f"({result}) {cache.hits} hits, {cache.misses} misses, "
+                f"{path.stat().st_size // 1024} KB saved"
+            )
+
+
+def benchmark_graph(
+    stones: str = "125 17", blinks: int = 10_000, modulus: int = 2**61 - 1
+) -> None:
+    """Compare blinking with squaring the transition matrix of a small graph.
+
+    Exact counts are compared with 'count_stones', then the graph alone counts
+    modulo 'modulus' for some huge numbers of blinks.
+    """
+    data = stones.split()
+    graph = TransitionGraph(data)
+    print(f"\nStarting stones: {stones} ({len(graph.values)} values)")
+
+    def counting() -> int:
+        return count_stones(data, blinks, transform_stone)
+
+    def squaring() -> int:
+        return graph.count_stones(data, blinks)
+
+    versions: dict[str, Callable[[], int]] = {
+        "counting": counting,
+        "graph": squaring,
+    }
+    for name, version in versions.items():
+        start_time = time.perf_counter()
+        result = version()
+        elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+        print(
+            f"{name:>18} : {blinks:5} blinks {elapsed_time_ms:10.3f} ms "
+            f"({len(str(result))} digit result)"
+        )
+
+    for power in (6, 12, 18):
+        start_time = time.perf_counter()
+        result = graph.count_stones(data, 10**power, modulus)
+        elapsed_time_ms = (time.perf_counter() - start_time) * 1000
+        print(
+            f"{'graph (modulo)':>18} : 10**{power} blinks "
+            f"{elapsed_time_ms:10.3f} ms ({result})"
+        )
 
 
 @timer
 def main() -> None:
     """Run the AOC problem for Day 11."""
     data = get_data()
+    backend = DEFAULT_BACKEND
 
     # Part 1 for me is 183248
-    result1 = part1(data)
+    result1 = part1(data, backend)
     print(f"Part 1: After 25 blinks we have {result1} stones!")
 
     # Part 2 for me is 218811774248729
-    result2 = part2(data)
+    result2 = part2(data, backend)
     print(f"Part 2: After 75 blinks we have an astonishing {result2} stones!")
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
 
 # ---------------------------------- timings --------------------------------- #
 # ------------- Run on an i7-14700K with SSD and DDR5-6000 memory ------------ #
@@ -0,0 +1,33 @@
+"""Tests that every Day 11 backend gives the same answers as the string one."""
+
+from __future__ import annotations
+
+import pytest
+from main import BACKENDS, stone_totals, transform_stone
+
+# the puzzle's example, with 55312 stones after 25 blinks
+SAMPLE = ["125", "17"]
+
+# small stones, then the edges of every digit count up to 61 digits
+STONES = [
+    *range(20_001),
+    *(10**power for power in range(61)),
+    *(10**power - 1 for power in range(1, 61)),
+]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_transform_matches_string(backend: str) -> None:
+    """Each stone splits into the same stones as the string version."""
+    parse, transform = BACKENDS[backend]
+    for stone in STONES:
+        expected = transform_stone(str(stone))
+        assert [str(new) for new in transform(parse(str(stone)))] == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_totals_match_string(backend: str) -> None:
+    """The sample has the same number of stones after every blink."""
+    expected = stone_totals(SAMPLE, 75, "string")
+    assert expected[25] == 55312  # noqa: PLR2004
+    assert stone_totals(SAMPLE, 75, backend) == expected
@@ -1,7 +1,19 @@
-"""AOC 2024 - Day 12: Garden Groups."""
+"""AOC 2024 - Day 12: Garden Groups.
+
+The original solution finds each region with a recursive search, then works out
+its perimeter and sides from a set of its points. 'solve_union_find' labels the
+regions in a single scan instead, joining each plot to the ones above and to
+the left of it with union-find. The area, fences and corners of every plot
+only depend on its neighbours, so they are added to its region as we go. A
+region has as many sides as corners, so no sets of points are needed.
+
+Run with '--bench' to compare them on generated gardens.
+"""
 
 from __future__ import annotations
 
+import random
+import sys
 import time
 from functools import wraps
 from pathlib import Path
@@ -15,6 +27,9 @@ R = TypeVar("R")
 
 Point: TypeAlias = tuple[int, int]
 
+# surrounds the garden in 'solve_union_find', so it never matches a plant
+BORDER = " "
+
 
 def timer(func: Callable[P, R]) -> Callable[P, R]:
     """Measure the execution time of a function in milliseconds.
@@ -110,12 +125,130 @@ def solve(grid: list[str]) -> tuple[int, int]:
     return total_cost, discounted_cost
 
 
+@timer
+def solve_union_find(grid: list[str]) -> tuple[int, int]:
+    """Solve both parts in one scan, labelling the regions with union-find.
+
+    The garden is flattened with a 'BORDER' around it, so every plot has all
+    8 neighbours. Each plot starts as its own region, with an area of 1, a
+    fence on each side without the same plant, and its corners (outside or
+    inside). Joining it to the same plant above or to the left adds the
+    smaller region's totals to the larger one's.
+    """
+    width = len(grid[0]) + 2
+    edge = BORDER * width
+    garden = edge + "".join(f"{BORDER}{line}{BORDER}" for line in grid) + edge
+
+    parent = list(range(len(garden)))
+    area = [0] * len(garden)
+    fences = [0] * len(garden)
+    corners = [0] * len(garden)
+
+    def find(plot: int) -> int:
+        while parent[plot] != plot:
+            parent[plot] = parent[parent[plot]]  # halve the path as we go
+            plot = parent[plot]
+        return plot
+
+    def union(plot: int, other: int) -> None:
+        root, other_root = find(plot), find(other)
+        if root == other_root:
+            return
+        if area[root] < area[other_root]:
+            root, other_root = other_root, root
+        parent[other_root] = root
+        area[root] += area[other_root]
+        fences[root] += fences[other_root]
+        corners[root] += corners[other_root]
+
+    for plot in range(width + 1, len(garden) - width - 1):
+        plant = garden[plot]
+        if plant == BORDER:
+            continue
+
+        up = garden[plot - width] == plant
+        down = garden[plot + width] == plant
+        left = garden[plot - 1] == plant
+        right = garden[plot + 1] == plant
+
+        # a corner in each quarter where both sides have a fence, or neither
+        # does but the diagonal between them has one
+        up_left = garden[plot - width - 1] == plant
+        up_right = garden[plot - width + 1] == plant
+        down_left = garden[plot + width - 1] == plant
+        down_right = garden[plot + width + 1] == plant
+        plot_corners = 0
+        if up == left and not (up and up_left):
+            plot_corners += 1
+        if up == right and not (up and up_right):
+            plot_corners += 1
+        if down == left and not (down and down_left):
+            plot_corners += 1
+        if down == right and not (down and down_right):
+            plot_corners += 1
+
+        area[plot] = 1
+        fences[plot] = 4 - up - down - left - right
+        corners[plot] = plot_corners
+
+        if left:
+            union(plot - 1, plot)
+        if up:
+            union(plot - width, plot)
+
+    total_cost = 0
+    discounted_cost = 0
+    for plot, root in enumerate(parent):
+        if plot == root and area[plot]:
+            total_cost += area[plot] * fences[plot]
+            discounted_cost += area[plot] * corners[plot]
+    return total_cost, discounted_cost
+
+
+def generate_garden(size: int, seed: int = 2024) -> list[str]:
+    """Generate a square garden of irregular regions for benchmarking.
+
+    Most plots copy the plant above or to the left, which grows the regions.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    plants = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    rows: list[str] = []
+    for y in range(size):
+        row: list[str] = []
+        for x in range(size):
+            roll = rng.random()
+            if roll < 0.3 and x:  # noqa: PLR2004
+                row.append(row[-1])
+            elif roll < 0.6 and y:  # noqa: PLR2004
+                row.append(rows[-1][x])
+            else:
+                row.append(rng.choice(plants))
+        rows.append("".join(row))
+    return rows
+
+
+def benchmark(size: int = 140, large_size: int = 2000) -> None:
+    """Compare both versions, then time union-find on a much larger garden.
+
+    The recursive search runs out of stack on big regions, so the original only
+    gets the puzzle sized garden.
+    """
+    grid = generate_garden(size)
+    print(f"{size}x{size} garden")
+    print(f"  solve : {solve(grid)}")
+    print(f"  solve_union_find : {solve_union_find(grid)}")
+
+    grid = generate_garden(large_size)
+    print(f"{large_size}x{large_size} garden")
+    print(f"  solve_union_find : {solve_union_find(grid)}")
+
+
 @timer
 def main() -> None:
     """Solve Day 12."""
     grid = get_data("input.txt")
 
-    part1, part2 = solve(grid)
+    part1, part2 = solve_union_find(grid)
 
     print(f"Part 1: Pricing using area is {part1}")  # answer for me is 1485656
     print(
@@ -124,7 +257,10 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        main()
 
 # ---------------------------------- timings --------------------------------- #
 # ------------- Run on an i7-14700K with SSD and DDR5-6000 memory ------------ #